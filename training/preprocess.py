@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Image Cache Preprocessing Script
+================================
+
+Decodes every training image once and writes it to a single memory-mapped
+uint8 array, so training reads a zero-copy slice per sample instead of
+opening and decoding a PNG/JPEG file every epoch.
+
+**Output** (written next to the CSVs in the data directory):
+- images.npy: uint8 array of shape (N, 3, 224, 224)
+- image_ids.npy: image_id for each row of images.npy
+
+`FacialAnalysisDataset` picks the cache up automatically when both files
+exist and it uses the default transform; delete them (or re-run this
+script) after changing the images.
+
+**Usage**:
+    python preprocess.py --data_dir ./data
+
+For faster resizing, install Pillow-SIMD in place of Pillow:
+    pip uninstall pillow && pip install pillow-simd
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+from tqdm import tqdm
+
+
+IMAGE_SIZE = 224
+IMAGE_EXTENSIONS = ('.png', '.jpg')
+
+IMAGE_CACHE_FILE = 'images.npy'
+IMAGE_IDS_FILE = 'image_ids.npy'
+
+
+def build_image_cache(data_dir: str, image_size: int = IMAGE_SIZE) -> int:
+    """
+    Decode and resize all images in data_dir/images into images.npy
+
+    Returns:
+        Number of cached images
+    """
+    data_path = Path(data_dir)
+    images_dir = data_path / 'images'
+
+    if not images_dir.exists():
+        raise FileNotFoundError(f"Images directory not found: {images_dir}")
+
+    image_paths = sorted(
+        p for p in images_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS
+    )
+
+    # Written with a .npy header so np.load(mmap_mode='r') can map it directly
+    cache = np.lib.format.open_memmap(
+        data_path / IMAGE_CACHE_FILE,
+        mode='w+',
+        dtype=np.uint8,
+        shape=(len(image_paths), 3, image_size, image_size)
+    )
+
+    for i, image_path in enumerate(tqdm(image_paths, desc="Caching images")):
+        image = Image.open(image_path).convert('RGB')
+        image = image.resize((image_size, image_size), Image.BILINEAR)
+        cache[i] = np.asarray(image, dtype=np.uint8).transpose(2, 0, 1)
+
+    cache.flush()
+    del cache
+
+    image_ids = np.array([p.stem for p in image_paths])
+    np.save(data_path / IMAGE_IDS_FILE, image_ids)
+
+    return len(image_paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-decode training images into a memory-mapped cache')
+    parser.add_argument('--data_dir', type=str, required=True, help='Directory containing training data')
+    parser.add_argument('--image_size', type=int, default=IMAGE_SIZE, help='Output image size')
+
+    args = parser.parse_args()
+
+    try:
+        count = build_image_cache(args.data_dir, image_size=args.image_size)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return
+
+    print(f"Cached {count} images to {Path(args.data_dir) / IMAGE_CACHE_FILE}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Regression tests for stratified_train_test_split with many small strata
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from train_facial_analysis_model import stratified_train_test_split  # noqa: E402
+
+
+DEMOGRAPHICS = ['ethnicity', 'gender', 'skin_tone']
+
+
+def make_demographics(num_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Random rows over the documented 10 x 3 x 6 demographic value sets"""
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        'ethnicity': rng.choice([f'ethnicity_{i}' for i in range(10)], num_rows),
+        'gender': rng.choice(['male', 'female', 'other'], num_rows),
+        'skin_tone': rng.randint(1, 7, num_rows),
+    })
+
+
+@pytest.mark.parametrize('num_rows', [60, 200, 500])
+def test_split_with_many_small_strata(num_rows):
+    data = make_demographics(num_rows)
+    train_indices, val_indices = stratified_train_test_split(data, DEMOGRAPHICS)
+
+    assert not set(train_indices) & set(val_indices)
+    assert sorted(train_indices + val_indices) == list(data.index)
+
+    # Every group that can be split has at least one validation row,
+    # and single-row groups stay in training
+    val_set = set(val_indices)
+    for _, group in data.groupby(DEMOGRAPHICS):
+        in_val = sum(index in val_set for index in group.index)
+        if len(group) >= 2:
+            assert 1 <= in_val == int(np.ceil(len(group) * 0.2))
+        else:
+            assert in_val == 0
+
+
+def test_split_is_deterministic_and_keeps_labels():
+    data = make_demographics(200)
+    data.index = data.index + 1000
+
+    first = stratified_train_test_split(data, DEMOGRAPHICS)
+    second = stratified_train_test_split(data, DEMOGRAPHICS)
+
+    assert first == second
+    assert set(first[0]) | set(first[1]) == set(data.index)
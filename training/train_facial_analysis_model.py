@@ -29,7 +29,11 @@ Uses MobileNetV2 backbone with bias mitigation and fairness constraints.
 """
 
 import argparse
+import contextlib
+import copy
+import functools
 import os
+import random
 import json
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
@@ -47,6 +51,9 @@ except ImportError:
 try:
     import torch
     import torch.nn as nn
+    import torch.nn.functional as F
+    from torch.utils.checkpoint import checkpoint, checkpoint_sequential
+    from torch.nn.utils.fusion import fuse_conv_bn_eval
     PYTORCH_AVAILABLE = True
 except ImportError:
     PYTORCH_AVAILABLE = False
@@ -59,20 +66,79 @@ except ImportError:
     COREML_AVAILABLE = False
     print("Warning: Core ML Tools not available. Install with: pip install coremltools")
 
+try:
+    import pyarrow
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    print("Note: PyArrow not available. Using the default CSV parser. Install with: pip install pyarrow")
+
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+from sklearn.metrics import classification_report, confusion_matrix
 from torch.utils.data import Dataset, DataLoader
+import torchmetrics
 from PIL import Image
 import torchvision.transforms as transforms
+from torchvision.transforms import InterpolationMode
+from torchvision.models import mobilenet_v2, MobileNet_V2_Weights
 from tqdm import tqdm
 
+from preprocess import IMAGE_CACHE_FILE, IMAGE_IDS_FILE, build_image_cache
+
+
+# ImageNet normalization statistics used by the pretrained MobileNetV2 backbone
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+
+class InPlaceNormalize:
+    """
+    ImageNet normalization applied in place on a (3, H, W) or (B, 3, H, W) float tensor
+    
+    Mean/std tensors are built once (on device, and pre-multiplied by scale
+    for 0-255 pixel values), avoiding the intermediate allocation of
+    transforms.Normalize.
+    """
+    
+    def __init__(self, mean: List[float] = IMAGENET_MEAN, std: List[float] = IMAGENET_STD,
+                 scale: float = 1.0, device=None):
+        self.mean = (torch.tensor(mean, device=device) * scale).view(3, 1, 1)
+        self.std = (torch.tensor(std, device=device) * scale).view(3, 1, 1)
+    
+    def __call__(self, tensor):
+        return tensor.sub_(self.mean).div_(self.std)
+
 
 # ============================================================================
 # Model Architecture
 # ============================================================================
 
+@contextlib.contextmanager
+def _frozen_batchnorm_stats(module: nn.Module):
+    """
+    Keep BatchNorm running stats fixed while a checkpointed segment is recomputed
+    
+    Normalization still uses batch statistics, so the recomputed activations
+    match the original forward; only the second running-stat update is skipped.
+    """
+    batchnorms = [m for m in module.modules() if isinstance(m, nn.modules.batchnorm._BatchNorm)]
+    saved = [(bn.momentum, bn.num_batches_tracked.clone()) for bn in batchnorms]
+    for bn in batchnorms:
+        bn.momentum = 0.0
+    try:
+        yield
+    finally:
+        for bn, (momentum, num_batches_tracked) in zip(batchnorms, saved):
+            bn.momentum = momentum
+            bn.num_batches_tracked.copy_(num_batches_tracked)
+
+
+def _batchnorm_safe_context(module: nn.Module):
+    """checkpoint context_fn: plain forward, BatchNorm-frozen recompute"""
+    return contextlib.nullcontext(), _frozen_batchnorm_stats(module)
+
+
 class FacialAnalysisModel(nn.Module):
     """
     Multi-modal facial analysis model
@@ -83,33 +149,34 @@ class FacialAnalysisModel(nn.Module):
     - Multi-task heads: angle regression, category classification, confidence
     """
     
-    def __init__(self, num_metadata_features: int = 6, num_arkit_features: int = 10):
+    def __init__(self, num_metadata_features: int = 6, num_arkit_features: int = 10,
+                 use_checkpointing: bool = False):
         super(FacialAnalysisModel, self).__init__()
         
-        # Image feature extraction (MobileNetV2 backbone)
-        # In production, would use pre-trained MobileNetV2
-        # For now, placeholder architecture
+        # Recompute backbone/fusion activations in backward to cut peak memory
+        self.use_checkpointing = use_checkpointing
+        
+        # Image feature extraction (ImageNet-pretrained MobileNetV2 backbone)
         self.image_backbone = self._create_mobilenetv2_backbone()
-        image_feature_dim = 1280  # MobileNetV2 output dimension
+        self.image_feature_dim = 1280  # MobileNetV2 output dimension
         
-        # Metadata embedding
-        self.metadata_embedding = nn.Sequential(
-            nn.Linear(num_metadata_features, 32),
+        # Joint metadata + ARKit embedding
+        # One batched MLP over the concatenated (B, 6 + 10) input instead of two
+        # serial MLPs on tiny tensors; block-diagonal init starts it equivalent to
+        # separate 32/64-unit metadata and ARKit embeddings
+        self.meta_arkit_embedding = nn.Sequential(
+            nn.Linear(num_metadata_features + num_arkit_features, 64),
             nn.ReLU(),
             nn.Dropout(0.2),
-            nn.Linear(32, 64)
+            nn.Linear(64, 128)
         )
-        
-        # ARKit features embedding
-        self.arkit_embedding = nn.Sequential(
-            nn.Linear(num_arkit_features, 32),
-            nn.ReLU(),
-            nn.Dropout(0.2),
-            nn.Linear(32, 64)
+        self._init_block_diagonal(
+            self.meta_arkit_embedding[0], [num_metadata_features, num_arkit_features], [32, 32]
         )
+        self._init_block_diagonal(self.meta_arkit_embedding[3], [32, 32], [64, 64])
         
         # Multi-modal fusion
-        fusion_dim = image_feature_dim + 64 + 64  # image + metadata + arkit
+        fusion_dim = self.image_feature_dim + 64 + 64  # image + metadata + arkit
         self.fusion_layer = nn.Sequential(
             nn.Linear(fusion_dim, 512),
             nn.ReLU(),
@@ -142,27 +209,49 @@ class FacialAnalysisModel(nn.Module):
             nn.Sigmoid()  # Confidence score 0-1
         )
     
+    @staticmethod
+    def _init_block_diagonal(linear: nn.Linear, in_splits: List[int], out_splits: List[int]):
+        """Zero the off-diagonal weight blocks so each input group feeds only its own outputs"""
+        with torch.no_grad():
+            mask = torch.block_diag(*[torch.ones(o, i) for i, o in zip(in_splits, out_splits)])
+            linear.weight.mul_(mask)
+    
     def _create_mobilenetv2_backbone(self):
         """
         Create MobileNetV2 backbone for image feature extraction
-        In production, would use pre-trained weights
+        Uses torchvision's ImageNet-pretrained weights (1280-dim pooled features)
         """
-        # Placeholder - would use torchvision.models.mobilenet_v2
-        # For now, return a simple CNN
+        backbone = mobilenet_v2(weights=MobileNet_V2_Weights.DEFAULT)
         return nn.Sequential(
-            nn.Conv2d(3, 32, 3, padding=1),
-            nn.ReLU(),
+            *backbone.features,
             nn.AdaptiveAvgPool2d((1, 1)),
-            nn.Flatten(),
-            nn.Linear(32, 1280)  # Match MobileNetV2 output dim
+            nn.Flatten()
         )
     
+    def _checkpointed_backbone(self, image, segments: int = 4):
+        """
+        Backbone forward with each segment's activations recomputed in backward
+        
+        BatchNorm running stats are frozen during the recompute so they are
+        updated once per step, as without checkpointing.
+        """
+        segment_size = -(-len(self.image_backbone) // segments)
+        features = image
+        for start in range(0, len(self.image_backbone), segment_size):
+            segment = self.image_backbone[start:start + segment_size]
+            features = checkpoint(
+                segment, features, use_reentrant=False,
+                context_fn=functools.partial(_batchnorm_safe_context, segment)
+            )
+        return features
+    
     def forward(self, image, metadata, arkit_features):
         """
         Forward pass
         
         Args:
-            image: Image tensor (B, 3, 224, 224)
+            image: Image tensor (B, 3, 224, 224), or precomputed backbone
+                features (B, 1280) from precompute_image_features
             metadata: Metadata tensor (B, 6)
             arkit_features: ARKit features tensor (B, 10)
         
@@ -171,18 +260,29 @@ class FacialAnalysisModel(nn.Module):
             category_logits: Category classification logits (B, 3)
             confidence: Confidence score (B, 1)
         """
-        # Extract image features
-        image_features = self.image_backbone(image)
+        use_checkpoint = self.use_checkpointing and self.training and torch.is_grad_enabled()
+        
+        # Extract image features (skipped when features were precomputed)
+        if image.dim() == 2:
+            image_features = image
+        elif use_checkpoint:
+            image_features = self._checkpointed_backbone(image)
+        else:
+            image_features = self.image_backbone(image)
         
-        # Embed metadata and ARKit features
-        metadata_emb = self.metadata_embedding(metadata)
-        arkit_emb = self.arkit_embedding(arkit_features)
+        # Embed metadata and ARKit features jointly
+        meta_arkit_emb = self.meta_arkit_embedding(torch.cat([metadata, arkit_features], dim=1))
         
         # Concatenate all features
-        fused_features = torch.cat([image_features, metadata_emb, arkit_emb], dim=1)
+        fused_features = torch.cat([image_features, meta_arkit_emb], dim=1)
         
         # Fusion layer
-        fused = self.fusion_layer(fused_features)
+        if use_checkpoint:
+            fused = checkpoint_sequential(
+                self.fusion_layer, segments=2, input=fused_features, use_reentrant=False
+            )
+        else:
+            fused = self.fusion_layer(fused_features)
         
         # Multi-task predictions
         angle = self.angle_head(fused)
@@ -209,25 +309,24 @@ def stratified_train_test_split(
     Returns:
         train_indices, val_indices (lists of integer indices)
     """
-    # Group by demographics
-    groups = data.groupby(demographics)
+    # Composite stratification key: one dense group number per demographic
+    # combination (missing values form their own group)
+    strata = data.groupby(demographics, sort=False, observed=True, dropna=False).ngroup().to_numpy()
     
-    train_indices = []
-    val_indices = []
+    # Shuffle once, then rank rows within their group; the first
+    # ceil(group_size * test_size) rows of each group go to validation
+    order = np.random.RandomState(42).permutation(len(data))
+    shuffled_strata = strata[order]
+    rank = pd.Series(shuffled_strata).groupby(shuffled_strata).cumcount().to_numpy()
+    group_sizes = np.bincount(strata)[shuffled_strata]
     
-    for _, group_df in groups:
-        if len(group_df) < 2:
-            # If group is too small, put all in training
-            train_indices.extend(group_df.index.tolist())
-            continue
-            
-        group_train, group_val = train_test_split(
-            group_df.index.tolist(),
-            test_size=test_size,
-            random_state=42
-        )
-        train_indices.extend(group_train)
-        val_indices.extend(group_val)
+    # Groups too small to split go entirely into training
+    is_val = (group_sizes >= 2) & (rank < np.ceil(group_sizes * test_size))
+    train_positions = np.sort(order[~is_val])
+    val_positions = np.sort(order[is_val])
+    
+    train_indices = data.index[train_positions].tolist()
+    val_indices = data.index[val_positions].tolist()
     
     return train_indices, val_indices
 
@@ -244,14 +343,12 @@ def calculate_demographic_metrics(
     """
     metrics = {}
     
+    # Per-sample correctness once, then a vectorized group mean per column
+    correct = pd.Series((np.asarray(predictions) == np.asarray(labels)).astype(np.float32))
+    
     for col in demographics.columns:
-        for value in demographics[col].unique():
-            mask = demographics[col] == value
-            if mask.sum() > 0:
-                group_pred = predictions[mask]
-                group_labels = labels[mask]
-                group_accuracy = accuracy_score(group_labels, group_pred)
-                metrics[f"{col}_{value}"] = group_accuracy
+        group_accuracy = correct.groupby(demographics[col].to_numpy()).mean()
+        metrics.update({f"{col}_{value}": float(acc) for value, acc in group_accuracy.items()})
     
     return metrics
 
@@ -283,6 +380,9 @@ class FacialAnalysisDataset(Dataset):
     Loads images, metadata, ARKit features, and labels from CSV files
     """
     
+    # Precomputed per-sample arrays kept in shared memory for worker processes
+    _SHARED_ARRAYS = ('_metadata', '_arkit', '_angle', '_category')
+    
     def __init__(self, data_dir: str, metadata_df: pd.DataFrame, 
                  arkit_df: pd.DataFrame, labels_df: pd.DataFrame,
                  transform=None):
@@ -293,30 +393,127 @@ class FacialAnalysisDataset(Dataset):
         self.labels_df = labels_df
         self.transform = transform or self._default_transform()
         
-        # Merge all dataframes on image_id
-        self.data = metadata_df.merge(arkit_df, on='image_id', how='inner')
-        self.data = self.data.merge(labels_df, on='image_id', how='inner')
+        # Join all dataframes on image_id in a single index-based pass
+        # (set_index copies, so the caller's frames are left untouched)
+        self.data = metadata_df.set_index('image_id').join(
+            [arkit_df.set_index('image_id'), labels_df.set_index('image_id')],
+            how='inner'
+        )
         
-        # Reset index to ensure sequential 0..n-1 indices for dataset access
-        self.data = self.data.reset_index(drop=True)
+        # Restore image_id as a column with sequential 0..n-1 indices for dataset access
+        self.data = self.data.reset_index()
         
         # Encode categorical variables
         self._encode_categorical()
         
+        # Normalized model inputs and labels as contiguous arrays
+        self._build_feature_arrays()
+        
+        # Resolve image files once instead of stat-ing them for every sample
+        path_cache = self._scan_images_dir()
+        
+        # Pre-decoded uint8 image cache from preprocess.py (optional). The cache
+        # holds default-transform output, so a custom transform always decodes files
+        cache_index = self._load_image_cache(enabled=transform is None)
+        
+        # Per-row image sources, so the hot path is plain array indexing
+        # ('' = no image file, -1 = not in the image cache)
+        self._image_paths = np.array(
+            [path_cache.get(image_id, '') for image_id in self._image_ids], dtype=object
+        )
+        self._cache_rows = np.array(
+            [cache_index.get(image_id, -1) for image_id in self._image_ids], dtype=np.int64
+        )
+        
+        # Cached backbone features replace images when set (see set_image_features)
+        self._image_features = None
+        self._image_features_path = None
+        
+    @classmethod
+    def prepare_cache(cls, data_dir: str, overwrite: bool = False) -> int:
+        """
+        Decode every image once into data_dir/images.npy (see preprocess.py)
+        
+        Returns:
+            Number of cached images (0 if an existing cache was kept)
+        """
+        data_path = Path(data_dir)
+        if not overwrite and (data_path / IMAGE_CACHE_FILE).exists() and (data_path / IMAGE_IDS_FILE).exists():
+            return 0
+        return build_image_cache(data_dir)
+    
+    def _scan_images_dir(self) -> Dict[str, str]:
+        """Map image_id -> image file path, preferring PNG over JPEG"""
+        if not self.images_dir.exists():
+            return {}
+        
+        entries = [e for e in os.scandir(self.images_dir) if e.name.endswith(('.png', '.jpg'))]
+        # JPEGs first so a PNG with the same id overrides it
+        entries.sort(key=lambda e: e.name.endswith('.png'))
+        return {os.path.splitext(e.name)[0]: e.path for e in entries}
+    
+    def _load_image_cache(self, enabled: bool = True) -> Dict[str, int]:
+        """
+        Memory-map images.npy if present so samples skip PNG/JPEG decode
+        
+        Args:
+            enabled: False skips the cache (e.g. a custom transform is in use)
+        
+        Returns:
+            Mapping of image_id -> row in the cache (empty if no cache)
+        """
+        self._image_cache = None
+        self._image_cache_path = None
+        
+        cache_path = self.data_dir / IMAGE_CACHE_FILE
+        ids_path = self.data_dir / IMAGE_IDS_FILE
+        if not (cache_path.exists() and ids_path.exists()):
+            return {}
+        if not enabled:
+            print(f"Ignoring image cache {cache_path}: a custom transform is in use")
+            return {}
+        
+        self._image_cache = np.load(cache_path, mmap_mode='r')
+        self._image_cache_path = str(cache_path)
+        cache_index = {str(image_id): i for i, image_id in enumerate(np.load(ids_path))}
+        print(f"Using image cache: {cache_path} ({len(cache_index)} images)")
+        return cache_index
+    
+    def set_image_features(self, features: Optional[np.ndarray]):
+        """
+        Return precomputed backbone features (N, 1280) instead of images
+        
+        Rows must follow dataset order; pass None to go back to loading images.
+        """
+        self._image_features = features
+        # Memory-mapped features are reopened by path in worker processes
+        self._image_features_path = getattr(features, 'filename', None)
+    
     def _default_transform(self):
-        """Default image transformations"""
+        """
+        Default image transformations (resize is SIMD-accelerated with pillow-simd)
+        
+        Produces uint8 tensors; ImageNet normalization happens per batch on the
+        training device (see _image_to_device), which also quarters the
+        host->device copy size versus float32.
+        """
         return transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], 
-                               std=[0.229, 0.224, 0.225])  # ImageNet normalization
+            transforms.Resize((224, 224), interpolation=InterpolationMode.BILINEAR, antialias=True),
+            transforms.PILToTensor()
         ])
     
+    @staticmethod
+    def _encode_with_lookup(values: pd.Series, mapping: Dict, default, dtype=np.float32) -> np.ndarray:
+        """Map values through mapping via Categorical codes; unknown/missing -> default"""
+        codes = pd.Categorical(values, categories=list(mapping)).codes
+        lookup = np.array(list(mapping.values()), dtype=dtype)
+        return np.where(codes >= 0, lookup[codes], default).astype(dtype)
+    
     def _encode_categorical(self):
         """Encode categorical variables to numeric"""
         # Gender encoding
         gender_map = {'male': 0.0, 'female': 1.0, 'other': 0.5}
-        self.data['gender_encoded'] = self.data['gender'].map(gender_map).fillna(0.5)
+        self.data['gender_encoded'] = self._encode_with_lookup(self.data['gender'], gender_map, 0.5)
         
         # Ethnicity encoding (simplified - would use one-hot in production)
         ethnicity_map = {
@@ -325,88 +522,186 @@ class FacialAnalysisDataset(Dataset):
             'pacific_islander': 0.75, 'mixed': 0.875, 'other': 0.9375,
             'prefer_not_to_say': 0.5
         }
-        self.data['ethnicity_encoded'] = self.data['ethnicity'].map(ethnicity_map).fillna(0.5)
+        self.data['ethnicity_encoded'] = self._encode_with_lookup(self.data['ethnicity'], ethnicity_map, 0.5)
         
         # Context encoding
         context_map = {'baseline': 0.0, 'progress': 0.5, 'followup': 1.0}
-        self.data['context_encoded'] = self.data['context'].map(context_map).fillna(0.0)
+        self.data['context_encoded'] = self._encode_with_lookup(self.data['context'], context_map, 0.0)
         
         # Category encoding
         category_map = {'low': 0, 'moderate': 1, 'high': 2}
-        self.data['category_encoded'] = self.data['true_category'].map(category_map).fillna(1)  # Default to 'moderate' (1)
+        self.data['category_encoded'] = self._encode_with_lookup(
+            self.data['true_category'], category_map, 1, dtype=np.int64
+        )  # Default to 'moderate' (1)
+    
+    def _column(self, name: str, default: float, dtype=np.float32) -> np.ndarray:
+        """Column as a NumPy array, or default for every row if the column is absent"""
+        if name in self.data.columns:
+            return self.data[name].to_numpy(dtype)
+        return np.full(len(self.data), default, dtype=dtype)
+    
+    def _build_feature_arrays(self):
+        """Precompute normalized metadata (N, 6), ARKit features (N, 10) and labels"""
+        # Metadata features (6 features)
+        self._metadata = np.ascontiguousarray(np.stack([
+            (self._column('age', 30) - 18) / 62.0,  # Normalize 18-80 to 0-1
+            self._column('gender_encoded', 0.5),
+            (self._column('bmi', 22.0) - 15) / 25.0,  # Normalize 15-40 to 0-1
+            self._column('ethnicity_encoded', 0.5),
+            (self._column('skin_tone', 3) - 1) / 5.0,  # Normalize 1-6 to 0-1
+            self._column('context_encoded', 0.0)
+        ], axis=1), dtype=np.float32)
+        
+        # ARKit features (10 features)
+        self._arkit = np.ascontiguousarray(np.stack([
+            (self._column('cervico_mental_angle', 100.0) - 70) / 80.0,  # Normalize 70-150 to 0-1
+            (self._column('submental_cervical_length', 40.0) - 15) / 45.0,  # Normalize 15-60 to 0-1
+            self._column('jaw_definition_index', 0.65),
+            (self._column('neck_circumference', 380.0) - 300) / 200.0,  # Normalize 300-500 to 0-1
+            self._column('facial_adiposity_index', 35.0) / 100.0,  # Normalize 0-100 to 0-1
+            (self._column('face_width', 145.0) - 120) / 60.0,  # Normalize 120-180 to 0-1
+            (self._column('face_height', 210.0) - 180) / 70.0,  # Normalize 180-250 to 0-1
+            self._column('head_pose_pitch', 0.0) / 30.0,  # Normalize ±30 to ±1
+            self._column('head_pose_yaw', 0.0) / 30.0,
+            self._column('head_pose_roll', 0.0) / 30.0
+        ], axis=1), dtype=np.float32)
+        
+        # Image ids (as str) for image path / cache lookup
+        self._image_ids = self.data['image_id'].astype(str).to_numpy()
+        
+        # Labels
+        self._angle = self._column('true_angle', 100.0)
+        self._category = self._column('category_encoded', 1, dtype=np.int64)
+        
+        # Back the arrays with shared-memory tensors so workers map them rather than copy
+        for name in self._SHARED_ARRAYS:
+            tensor = torch.from_numpy(getattr(self, name)).share_memory_()
+            setattr(self, f"{name}_t", tensor)
+            setattr(self, name, tensor.numpy())
+    
+    def __getstate__(self):
+        """
+        Pickle state for DataLoader worker processes
+        
+        Shared tensors travel as shared-memory handles; their NumPy views and
+        the memory-mapped image cache/features are rebuilt in __setstate__
+        instead of being pickled as full copies.
+        """
+        state = self.__dict__.copy()
+        for name in self._SHARED_ARRAYS:
+            del state[name]
+        state['_image_cache'] = None
+        if self._image_features_path is not None:
+            state['_image_features'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for name in self._SHARED_ARRAYS:
+            setattr(self, name, getattr(self, f"{name}_t").numpy())
+        if self._image_cache_path is not None:
+            self._image_cache = np.load(self._image_cache_path, mmap_mode='r')
+        if self._image_features_path is not None:
+            self._image_features = np.load(self._image_features_path, mmap_mode='r')
     
     def __len__(self):
         return len(self.data)
     
-    def __getitem__(self, idx):
-        row = self.data.iloc[idx]
-        image_id = row['image_id']
-        
-        # Load image
-        image_path = self.images_dir / f"{image_id}.png"
-        if not image_path.exists():
-            # Try JPEG
-            image_path = self.images_dir / f"{image_id}.jpg"
+    def _load_image_file(self, image_path: str):
+        """Decode and transform a single image file"""
+        if not image_path:
+            # Return black image if file not found
+            return torch.zeros(3, 224, 224, dtype=torch.uint8)
         
         try:
             image = Image.open(image_path).convert('RGB')
             if self.transform:
                 image = self.transform(image)
         except Exception as e:
-            # Return black image if file not found
-            image = torch.zeros(3, 224, 224)
-        
-        # Extract metadata features (6 features)
-        age = row.get('age', 30)
-        age_norm = (age - 18) / 62.0  # Normalize 18-80 to 0-1
-        gender = row.get('gender_encoded', 0.5)
-        bmi = row.get('bmi', 22.0)
-        bmi_norm = (bmi - 15) / 25.0  # Normalize 15-40 to 0-1
-        ethnicity = row.get('ethnicity_encoded', 0.5)
-        skin_tone = row.get('skin_tone', 3)
-        skin_tone_norm = (skin_tone - 1) / 5.0  # Normalize 1-6 to 0-1
-        context = row.get('context_encoded', 0.0)
-        
-        metadata = torch.tensor([
-            age_norm, gender, bmi_norm, ethnicity, skin_tone_norm, context
-        ], dtype=torch.float32)
-        
-        # Extract ARKit features (10 features)
-        angle = row.get('cervico_mental_angle', 100.0)
-        angle_norm = (angle - 70) / 80.0  # Normalize 70-150 to 0-1
-        length = row.get('submental_cervical_length', 40.0)
-        length_norm = (length - 15) / 45.0  # Normalize 15-60 to 0-1
-        jaw_idx = row.get('jaw_definition_index', 0.65)
-        neck = row.get('neck_circumference', 380.0)
-        neck_norm = (neck - 300) / 200.0  # Normalize 300-500 to 0-1
-        adiposity = row.get('facial_adiposity_index', 35.0)
-        adiposity_norm = adiposity / 100.0  # Normalize 0-100 to 0-1
-        face_width = row.get('face_width', 145.0)
-        face_width_norm = (face_width - 120) / 60.0  # Normalize 120-180 to 0-1
-        face_height = row.get('face_height', 210.0)
-        face_height_norm = (face_height - 180) / 70.0  # Normalize 180-250 to 0-1
-        pitch = row.get('head_pose_pitch', 0.0)
-        pitch_norm = pitch / 30.0  # Normalize ±30 to ±1
-        yaw = row.get('head_pose_yaw', 0.0)
-        yaw_norm = yaw / 30.0
-        roll = row.get('head_pose_roll', 0.0)
-        roll_norm = roll / 30.0
-        
-        arkit_features = torch.tensor([
-            angle_norm, length_norm, jaw_idx, neck_norm, adiposity_norm,
-            face_width_norm, face_height_norm, pitch_norm, yaw_norm, roll_norm
-        ], dtype=torch.float32)
-        
-        # Extract labels
-        angle_target = torch.tensor(row.get('true_angle', 100.0), dtype=torch.float32)
-        category_target = torch.tensor(row.get('category_encoded', 1), dtype=torch.long)
-        
-        return image, metadata, arkit_features, angle_target, category_target
+            # Return black image if file can't be decoded
+            image = torch.zeros(3, 224, 224, dtype=torch.uint8)
+        
+        return image
+    
+    def _load_image(self, idx):
+        """Image (or precomputed features) for one sample"""
+        if self._image_features is not None:
+            return torch.from_numpy(np.array(self._image_features[idx], dtype=np.float32))
+        
+        # Load image (from the memory-mapped cache when available)
+        cache_row = self._cache_rows[idx]
+        if cache_row >= 0:
+            return torch.from_numpy(np.array(self._image_cache[cache_row]))
+        
+        return self._load_image_file(self._image_paths[idx])
+    
+    def __getitem__(self, idx):
+        image = self._load_image(idx)
+        metadata = torch.from_numpy(self._metadata[idx])
+        arkit_features = torch.from_numpy(self._arkit[idx])
+        
+        return image, metadata, arkit_features, self._angle_t[idx], self._category_t[idx]
+    
+    def __getitems__(self, indices: List[int]):
+        """
+        Batched fetch used by DataLoader (PyTorch 2.x)
+        
+        Returns an already-collated [image, metadata, arkit, angle, category]
+        batch sliced from the precomputed arrays, so DataLoaders over this
+        dataset (or a Subset of it) must pass collate_fn=FacialAnalysisDataset.collate.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        
+        if self._image_features is not None:
+            images = torch.from_numpy(np.asarray(self._image_features[indices], dtype=np.float32))
+        else:
+            images = torch.stack([self._load_image(i) for i in indices])
+        
+        return [
+            images,
+            torch.from_numpy(self._metadata[indices]),
+            torch.from_numpy(self._arkit[indices]),
+            torch.from_numpy(self._angle[indices]),
+            torch.from_numpy(self._category[indices])
+        ]
+    
+    @staticmethod
+    def collate(batch):
+        """Pass-through collate_fn: __getitems__ already returns a full batch"""
+        return batch
+
+
+def _read_table(csv_path: Path) -> pd.DataFrame:
+    """
+    Read a data table, preferring a .parquet sibling of the CSV
+    
+    Uses PyArrow's multithreaded parser when available. Results stay
+    NumPy-backed so downstream .to_numpy() conversions are unchanged.
+    """
+    parquet_path = csv_path.with_suffix('.parquet')
+    if PYARROW_AVAILABLE and parquet_path.exists():
+        return pd.read_parquet(parquet_path)
+    if PYARROW_AVAILABLE:
+        return pd.read_csv(csv_path, engine='pyarrow')
+    return pd.read_csv(csv_path)
+
+
+def _check_table(csv_path: Path, description: str):
+    """Raise FileNotFoundError unless _read_table can read csv_path or its Parquet sibling"""
+    parquet_path = csv_path.with_suffix('.parquet')
+    if csv_path.exists() or (PYARROW_AVAILABLE and parquet_path.exists()):
+        return
+    if parquet_path.exists():
+        raise FileNotFoundError(
+            f"{description} CSV not found: {csv_path} ({parquet_path.name} exists, but reading "
+            f"Parquet requires the PyArrow engine: pip install pyarrow)"
+        )
+    raise FileNotFoundError(f"{description} CSV not found: {csv_path}")
 
 
 def load_data(data_dir: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
-    Load metadata, ARKit features, and labels from CSV files
+    Load metadata, ARKit features, and labels from CSV (or Parquet) files
     
     Returns:
         metadata_df, arkit_df, labels_df
@@ -418,16 +713,13 @@ def load_data(data_dir: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     arkit_path = data_path / 'arkit_features.csv'
     labels_path = data_path / 'labels.csv'
     
-    if not metadata_path.exists():
-        raise FileNotFoundError(f"Metadata CSV not found: {metadata_path}")
-    if not arkit_path.exists():
-        raise FileNotFoundError(f"ARKit features CSV not found: {arkit_path}")
-    if not labels_path.exists():
-        raise FileNotFoundError(f"Labels CSV not found: {labels_path}")
+    _check_table(metadata_path, "Metadata")
+    _check_table(arkit_path, "ARKit features")
+    _check_table(labels_path, "Labels")
     
-    metadata_df = pd.read_csv(metadata_path)
-    arkit_df = pd.read_csv(arkit_path)
-    labels_df = pd.read_csv(labels_path)
+    metadata_df = _read_table(metadata_path)
+    arkit_df = _read_table(arkit_path)
+    labels_df = _read_table(labels_path)
     
     print(f"Loaded {len(metadata_df)} metadata records")
     print(f"Loaded {len(arkit_df)} ARKit feature records")
@@ -436,32 +728,276 @@ def load_data(data_dir: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     return metadata_df, arkit_df, labels_df
 
 
+def _seed_worker(worker_id: int):
+    """Seed NumPy and random in each DataLoader worker from torch's per-worker seed"""
+    seed = torch.initial_seed() % 2**32
+    np.random.seed(seed)
+    random.seed(seed)
+
+
+def worker_loader_kwargs() -> Dict:
+    """
+    DataLoader worker settings shared by all loaders
+    
+    Workers scale with the CPU count (capped at 8) and use the platform's
+    default start method. Forked workers share the dataset's NumPy buffers
+    with the parent; spawned workers (macOS/Windows) receive them as
+    shared-memory handles instead (see FacialAnalysisDataset.__getstate__).
+    """
+    return dict(
+        num_workers=min(8, os.cpu_count() or 2),
+        worker_init_fn=_seed_worker
+    )
+
+
+def build_loaders(
+    train_dataset: Dataset,
+    val_dataset: Dataset,
+    batch_size: int,
+    device: str = 'cpu'
+) -> Tuple[DataLoader, DataLoader]:
+    """
+    Build train/validation DataLoaders with asynchronous worker prefetching
+    
+    Persistent workers avoid re-forking every epoch, and pinned memory lets
+    train_model overlap host->device copies with compute via non_blocking.
+    Datasets must be FacialAnalysisDataset (or a Subset of one), since
+    batches come pre-collated from __getitems__.
+    
+    Returns:
+        train_loader, val_loader
+    """
+    loader_kwargs = dict(
+        batch_size=batch_size,
+        collate_fn=FacialAnalysisDataset.collate,
+        pin_memory=device == 'cuda',
+        persistent_workers=True,
+        prefetch_factor=4,
+        **worker_loader_kwargs()
+    )
+    
+    # Drop the ragged last batch only when at least one full batch remains
+    train_loader = DataLoader(
+        train_dataset, shuffle=True, drop_last=len(train_dataset) >= batch_size, **loader_kwargs
+    )
+    val_loader = DataLoader(val_dataset, shuffle=False, **loader_kwargs)
+    
+    return train_loader, val_loader
+
+
 # ============================================================================
 # Training Functions
 # ============================================================================
 
+_device_normalizers: Dict[str, InPlaceNormalize] = {}
+
+
+def _image_to_device(image: torch.Tensor, device: str) -> torch.Tensor:
+    """
+    Move an image batch to device; 4D image batches use channels_last layout
+    
+    uint8 batches are converted to float and ImageNet-normalized on device
+    in one pass, with the mean/std tensors cached per device.
+    """
+    if image.dim() == 4:
+        image = image.to(device, memory_format=torch.channels_last, non_blocking=True)
+    else:
+        image = image.to(device, non_blocking=True)
+    
+    if image.dtype == torch.uint8:
+        key = str(image.device)
+        if key not in _device_normalizers:
+            _device_normalizers[key] = InPlaceNormalize(scale=255.0, device=image.device)
+        image = _device_normalizers[key](image.float())
+    
+    return image
+
+
+class CUDAPrefetcher:
+    """
+    Wrap a DataLoader so the next batch is copied to the GPU on a side stream
+    
+    The host->device copy of batch i+1 overlaps with forward/backward on
+    batch i. Yields batches already on device; re-iterable once per epoch.
+    """
+    
+    def __init__(self, loader, device: str = 'cuda'):
+        self.loader = loader
+        self.device = device
+        self.stream = torch.cuda.Stream()
+        self._loader_iter = None
+        self._next_batch = None
+    
+    def __len__(self):
+        return len(self.loader)
+    
+    def __iter__(self):
+        self._loader_iter = iter(self.loader)
+        self._preload()
+        
+        while self._next_batch is not None:
+            current_stream = torch.cuda.current_stream()
+            current_stream.wait_stream(self.stream)
+            batch = self._next_batch
+            # Tensors were allocated on the side stream; keep them alive for this one
+            for tensor in batch:
+                tensor.record_stream(current_stream)
+            
+            self._preload()
+            yield batch
+    
+    def _preload(self):
+        """Issue the next batch's non_blocking copies on the side stream"""
+        try:
+            image, *rest = next(self._loader_iter)
+        except StopIteration:
+            self._next_batch = None
+            return
+        
+        with torch.cuda.stream(self.stream):
+            self._next_batch = [_image_to_device(image, self.device)] + [
+                tensor.to(self.device, non_blocking=True) for tensor in rest
+            ]
+
+
+def precompute_image_features(
+    model: nn.Module,
+    dataset: Dataset,
+    output_path: str,
+    batch_size: int = 32,
+    device: str = 'cpu'
+) -> np.ndarray:
+    """
+    Run the image backbone once over the dataset and cache the features
+    
+    Without augmentation the backbone output is identical every epoch, so the
+    features are written to a float16 .npy file and training only has to fit
+    the fusion layer and heads.
+    
+    Returns:
+        Read-only memory-mapped features array of shape (N, 1280)
+    """
+    model = model.to(device).eval()
+    loader = DataLoader(
+        dataset,
+        batch_size=batch_size,
+        collate_fn=FacialAnalysisDataset.collate,
+        shuffle=False,
+        pin_memory=device == 'cuda',
+        **worker_loader_kwargs()
+    )
+    
+    features = np.lib.format.open_memmap(
+        output_path, mode='w+', dtype=np.float16,
+        shape=(len(dataset), model.image_feature_dim)
+    )
+    
+    offset = 0
+    with torch.no_grad():
+        for image, *_ in tqdm(loader, desc="Precomputing image features"):
+            batch_features = model.image_backbone(_image_to_device(image, device))
+            features[offset:offset + len(batch_features)] = batch_features.cpu().numpy()
+            offset += len(batch_features)
+    
+    features.flush()
+    del features
+    
+    return np.load(output_path, mmap_mode='r')
+
+
+def multitask_loss(
+    angle_pred: torch.Tensor,
+    angle_target: torch.Tensor,
+    category_logits: torch.Tensor,
+    category_target: torch.Tensor,
+    confidence: torch.Tensor
+) -> torch.Tensor:
+    """
+    Combined training loss: angle MSE + category cross-entropy + 0.1 * confidence MSE
+    
+    Confidence is regressed toward a constant 0.8 target (would be based on
+    prediction uncertainty), computed analytically without a target tensor.
+    Kept as one function so torch.compile can fuse the elementwise ops.
+    """
+    angle_loss = F.mse_loss(angle_pred.squeeze(-1), angle_target)
+    category_loss = F.cross_entropy(category_logits, category_target)
+    confidence_loss = (confidence.float() - 0.8).square().mean()
+    return angle_loss + category_loss + 0.1 * confidence_loss
+
+
 def train_model(
     model: nn.Module,
     train_loader,
     val_loader,
     num_epochs: int = 50,
     learning_rate: float = 0.001,
-    device: str = 'cpu'
+    device: str = 'cpu',
+    compile_model: bool = True
 ) -> Dict:
     """
     Train the model with bias mitigation
     
+    The best validation weights are kept in memory, written once to
+    best_model.pth, and loaded back into model before returning.
+    On CUDA, compile_model runs the model and loss through torch.compile.
+    
     Returns training history dictionary
     """
+    if len(train_loader) == 0 or len(val_loader) == 0:
+        raise ValueError(
+            f"Empty data loader (train batches: {len(train_loader)}, "
+            f"validation batches: {len(val_loader)}); add more samples or lower batch_size"
+        )
+    
+    if device == 'cuda':
+        # Input shapes are fixed, so cuDNN can cache the fastest conv algorithm;
+        # TF32 runs the remaining FP32 matmuls/convs on tensor cores (Ampere+)
+        torch.backends.cudnn.benchmark = True
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+        torch.set_float32_matmul_precision('high')
+    
+    # Overlap host->device copies with compute
+    if device == 'cuda':
+        train_loader = CUDAPrefetcher(train_loader, device)
+        val_loader = CUDAPrefetcher(val_loader, device)
+    
     model = model.to(device)
+    # NHWC layout lets cuDNN pick its tensor-core convolution kernels
+    model = model.to(memory_format=torch.channels_last)
+    
+    # Inductor fuses the small Linear/ReLU/Dropout chains into fewer kernels.
+    # Checkpoints are still taken from the eager module so state_dict keys
+    # stay free of the compiled wrapper's prefix.
+    use_compile = compile_model and device == 'cuda'
+    compiled_model = model
+    if use_compile:
+        compiled_model = torch.compile(model, mode='reduce-overhead', fullgraph=False, dynamic=False)
+    
+    # Loss function (compiled alongside the model on CUDA)
+    loss_fn = multitask_loss
+    if use_compile:
+        loss_fn = torch.compile(multitask_loss)
+    
+    # Optimizer (fused multi-tensor update kernel on CUDA)
+    optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate, fused=device == 'cuda')
     
-    # Loss functions
-    angle_criterion = nn.MSELoss()  # Regression loss for angle
-    category_criterion = nn.CrossEntropyLoss()  # Classification loss
-    confidence_criterion = nn.MSELoss()  # Confidence loss
+    # Mixed precision on CUDA: bfloat16 where supported (no loss scaling needed),
+    # otherwise float16 with GradScaler; no-op on CPU
+    use_amp = device == 'cuda'
+    amp_dtype = torch.bfloat16 if use_amp and torch.cuda.is_bf16_supported() else torch.float16
+    scaler = torch.cuda.amp.GradScaler(enabled=use_amp and amp_dtype == torch.float16)
     
-    # Optimizer
-    optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+    # On-device running metrics, read back once per epoch
+    # (validate_args=False skips per-batch input checks that sync with the host)
+    train_angle_mae = torchmetrics.MeanAbsoluteError().to(device)
+    val_angle_mae = torchmetrics.MeanAbsoluteError().to(device)
+    train_category_acc = torchmetrics.Accuracy(
+        task='multiclass', num_classes=3, validate_args=False
+    ).to(device)
+    val_category_acc = torchmetrics.Accuracy(
+        task='multiclass', num_classes=3, validate_args=False
+    ).to(device)
     
     # Training history
     history = {
@@ -474,137 +1010,250 @@ def train_model(
     }
     
     best_val_loss = float('inf')
+    best_state = None
     
     for epoch in range(num_epochs):
         # Training phase
         model.train()
-        train_loss = 0.0
-        train_angle_errors = []
-        train_category_correct = 0
-        train_category_total = 0
+        train_loss = torch.zeros((), device=device)
+        train_angle_mae.reset()
+        train_category_acc.reset()
         
         for batch in train_loader:
             image, metadata, arkit, angle_target, category_target = batch
             
             # Move to device
-            image = image.to(device)
-            metadata = metadata.to(device)
-            arkit = arkit.to(device)
-            angle_target = angle_target.to(device)
-            category_target = category_target.to(device)
+            image = _image_to_device(image, device)
+            metadata = metadata.to(device, non_blocking=True)
+            arkit = arkit.to(device, non_blocking=True)
+            angle_target = angle_target.to(device, non_blocking=True)
+            category_target = category_target.to(device, non_blocking=True)
             
             # Forward pass
-            angle_pred, category_logits, confidence = model(image, metadata, arkit)
+            with torch.autocast('cuda', dtype=amp_dtype, enabled=use_amp):
+                angle_pred, category_logits, confidence = compiled_model(image, metadata, arkit)
             
-            # Calculate losses
-            angle_loss = angle_criterion(angle_pred.squeeze(), angle_target)
-            category_loss = category_criterion(category_logits, category_target)
-            # Confidence loss would be based on prediction uncertainty
-            confidence_loss = confidence_criterion(confidence, torch.ones_like(confidence) * 0.8)
-            
-            # Combined loss
-            total_loss = angle_loss + category_loss + 0.1 * confidence_loss
+            # Combined loss, in FP32 outside autocast
+            total_loss = loss_fn(
+                angle_pred.float(), angle_target, category_logits.float(), category_target,
+                confidence.float()
+            )
             
             # Backward pass
-            optimizer.zero_grad()
-            total_loss.backward()
-            optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
+            scaler.scale(total_loss).backward()
+            scaler.step(optimizer)
+            scaler.update()
             
-            train_loss += total_loss.item()
+            train_loss += total_loss.detach()
             
             # Calculate metrics
-            train_angle_errors.extend(torch.abs(angle_pred.squeeze() - angle_target).cpu().numpy())
-            _, predicted = torch.max(category_logits, 1)
-            train_category_correct += (predicted == category_target).sum().item()
-            train_category_total += category_target.size(0)
+            predicted = category_logits.argmax(dim=1)
+            train_angle_mae.update(angle_pred.squeeze(-1).detach().float(), angle_target)
+            train_category_acc.update(predicted, category_target)
         
         # Validation phase
         model.eval()
-        val_loss = 0.0
-        val_angle_errors = []
-        val_category_correct = 0
-        val_category_total = 0
+        val_loss = torch.zeros((), device=device)
+        val_angle_mae.reset()
+        val_category_acc.reset()
         
         with torch.no_grad():
             for batch in val_loader:
                 image, metadata, arkit, angle_target, category_target = batch
                 
                 # Move to device
-                image = image.to(device)
-                metadata = metadata.to(device)
-                arkit = arkit.to(device)
-                angle_target = angle_target.to(device)
-                category_target = category_target.to(device)
+                image = _image_to_device(image, device)
+                metadata = metadata.to(device, non_blocking=True)
+                arkit = arkit.to(device, non_blocking=True)
+                angle_target = angle_target.to(device, non_blocking=True)
+                category_target = category_target.to(device, non_blocking=True)
                 
-                angle_pred, category_logits, confidence = model(image, metadata, arkit)
+                with torch.autocast('cuda', dtype=amp_dtype, enabled=use_amp):
+                    angle_pred, category_logits, confidence = compiled_model(image, metadata, arkit)
                 
-                angle_loss = angle_criterion(angle_pred.squeeze(), angle_target)
-                category_loss = category_criterion(category_logits, category_target)
-                confidence_loss = confidence_criterion(confidence, torch.ones_like(confidence) * 0.8)
-                total_loss = angle_loss + category_loss + 0.1 * confidence_loss
+                total_loss = loss_fn(
+                    angle_pred.float(), angle_target, category_logits.float(), category_target,
+                    confidence.float()
+                )
                 
-                val_loss += total_loss.item()
+                val_loss += total_loss
                 
-                val_angle_errors.extend(torch.abs(angle_pred.squeeze() - angle_target).cpu().numpy())
-                _, predicted = torch.max(category_logits, 1)
-                val_category_correct += (predicted == category_target).sum().item()
-                val_category_total += category_target.size(0)
+                predicted = category_logits.argmax(dim=1)
+                val_angle_mae.update(angle_pred.squeeze(-1).float(), angle_target)
+                val_category_acc.update(predicted, category_target)
         
         # Record history
-        history['train_loss'].append(train_loss / len(train_loader))
-        history['val_loss'].append(val_loss / len(val_loader))
-        history['train_angle_mae'].append(np.mean(train_angle_errors))
-        history['val_angle_mae'].append(np.mean(val_angle_errors))
-        history['train_category_acc'].append(train_category_correct / train_category_total)
-        history['val_category_acc'].append(val_category_correct / val_category_total)
+        history['train_loss'].append((train_loss / len(train_loader)).item())
+        history['val_loss'].append((val_loss / len(val_loader)).item())
+        history['train_angle_mae'].append(train_angle_mae.compute().item())
+        history['val_angle_mae'].append(val_angle_mae.compute().item())
+        history['train_category_acc'].append(train_category_acc.compute().item())
+        history['val_category_acc'].append(val_category_acc.compute().item())
         
         print(f"Epoch {epoch+1}/{num_epochs}")
         print(f"  Train Loss: {history['train_loss'][-1]:.4f}, Val Loss: {history['val_loss'][-1]:.4f}")
         print(f"  Train Angle MAE: {history['train_angle_mae'][-1]:.2f}°, Val Angle MAE: {history['val_angle_mae'][-1]:.2f}°")
         print(f"  Train Category Acc: {history['train_category_acc'][-1]:.4f}, Val Category Acc: {history['val_category_acc'][-1]:.4f}")
         
-        # Save best model
-        if val_loss < best_val_loss:
-            best_val_loss = val_loss
-            best_model_path = os.path.join(os.getcwd(), 'best_model.pth')
-            torch.save(model.state_dict(), best_model_path)
+        # Keep best model weights in memory
+        if history['val_loss'][-1] < best_val_loss:
+            best_val_loss = history['val_loss'][-1]
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+    
+    # Save best model once and restore it for export
+    if best_state is not None:
+        best_model_path = os.path.join(os.getcwd(), 'best_model.pth')
+        torch.save(best_state, best_model_path)
+        model.load_state_dict(best_state)
     
     return history
 
 
+def fuse_conv_bn(module: nn.Module) -> nn.Module:
+    """
+    Fold BatchNorm into the preceding convolution for inference
+    
+    Walks every nn.Sequential and replaces each (Conv2d, BatchNorm2d) pair with
+    a single conv whose weights/bias absorb the BN statistics:
+    W' = W * gamma / sqrt(var + eps), b' = (b - mean) * gamma / sqrt(var + eps) + beta
+    
+    MobileNetV2 uses ReLU6, which torch.quantization.fuse_modules cannot fuse,
+    so the activation stays a separate op for Core ML to fuse on-device.
+    Module must be in eval mode.
+    """
+    for submodule in module.modules():
+        if not isinstance(submodule, nn.Sequential):
+            continue
+        
+        names = list(submodule._modules.keys())
+        for name, next_name in zip(names, names[1:]):
+            conv = submodule._modules[name]
+            bn = submodule._modules[next_name]
+            if isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d):
+                submodule._modules[name] = fuse_conv_bn_eval(conv, bn)
+                submodule._modules[next_name] = nn.Identity()
+    
+    return module
+
+
+def distill_heads(model: nn.Module, loader, device: str = 'cpu') -> nn.Module:
+    """
+    Replace each two-layer task head with a single Linear for export
+    
+    Collects fusion-layer activations over loader and fits each new head by
+    least squares to the original head's outputs (pre-sigmoid for the
+    confidence head, which keeps its Sigmoid). Shrinks the Core ML graph at
+    the cost of the heads' ReLU nonlinearity. Model must be in eval mode.
+    """
+    activations = []
+    hook = model.fusion_layer.register_forward_hook(
+        lambda module, inputs, output: activations.append(output.float().cpu())
+    )
+    
+    with torch.no_grad():
+        for image, metadata, arkit, *_ in loader:
+            model(_image_to_device(image, device), metadata.to(device), arkit.to(device))
+    hook.remove()
+    
+    fused = torch.cat(activations)
+    design = torch.cat([fused, torch.ones(len(fused), 1)], dim=1)  # bias column
+    
+    for name in ['angle_head', 'category_head', 'confidence_head']:
+        layers = list(getattr(model, name).children())
+        activation = layers.pop() if isinstance(layers[-1], nn.Sigmoid) else None
+        
+        with torch.no_grad():
+            target = nn.Sequential(*layers).cpu()(fused)
+            solution = torch.linalg.lstsq(design, target).solution
+        
+        linear = nn.Linear(fused.size(1), target.size(1))
+        with torch.no_grad():
+            linear.weight.copy_(solution[:-1].T)
+            linear.bias.copy_(solution[-1])
+        
+        head = nn.Sequential(linear, activation) if activation is not None else linear
+        setattr(model, name, head.to(device))
+    
+    return model
+
+
+class NormalizedImageModel(nn.Module):
+    """
+    Export wrapper that applies the exact per-channel ImageNet normalization
+    
+    Core ML image inputs only support a scalar scale, so the model is exported
+    taking 0-1 pixels and normalizing with the per-channel mean/std itself.
+    """
+    
+    def __init__(self, model: nn.Module):
+        super(NormalizedImageModel, self).__init__()
+        self.model = model
+        self.register_buffer('mean', torch.tensor(IMAGENET_MEAN).view(1, 3, 1, 1))
+        self.register_buffer('std', torch.tensor(IMAGENET_STD).view(1, 3, 1, 1))
+    
+    def forward(self, image, metadata, arkit_features):
+        return self.model((image - self.mean) / self.std, metadata, arkit_features)
+
+
 def convert_to_coreml(
     model: nn.Module,
     output_path: str,
-    quantize: bool = True
+    quantize: bool = True,
+    distill_loader=None
 ):
     """
     Convert PyTorch model to Core ML format
     
     Args:
         model: Trained PyTorch model
-        output_path: Path to save .mlmodel file
-        quantize: Whether to quantize to 16-bit for mobile deployment
+        output_path: Path to save .mlpackage (ML Program) bundle
+        quantize: Whether to use FP16 compute with int8 weights for mobile
+            deployment (otherwise full FP32)
+        distill_loader: Optional loader used to collapse the task heads into
+            single Linear layers (see distill_heads)
     """
     if not COREML_AVAILABLE:
         print("Error: Core ML Tools not available. Cannot convert model.")
         return
     
-    # Set model to evaluation mode
-    model.eval()
+    # Fuse a CPU copy in evaluation mode so the caller's model keeps its BN layers
+    model = copy.deepcopy(model).cpu().eval()
+    fuse_conv_bn(model.image_backbone)
     
-    # Create example inputs
-    example_image = torch.randn(1, 3, 224, 224)
+    if distill_loader is not None:
+        distill_heads(model, distill_loader)
+    
+    # Core ML feeds 0-1 pixels; the wrapper normalizes them exactly as in training
+    model = NormalizedImageModel(model).eval()
+    
+    # Create example inputs (image in the same channels_last layout used in training)
+    example_image = torch.rand(1, 3, 224, 224).contiguous(memory_format=torch.channels_last)
     example_metadata = torch.randn(1, 6)
     example_arkit = torch.randn(1, 10)
     
-    # Trace the model
-    traced_model = torch.jit.trace(model, (example_image, example_metadata, example_arkit))
+    # Trace and freeze the model so eval-mode Dropout folds away and
+    # parameters become constants before Core ML conversion.
+    # torch.jit.optimize_for_inference is deliberately not applied: it rewrites
+    # convolutions into MKLDNN ops that coremltools cannot convert.
+    traced_model = torch.jit.trace(
+        model, (example_image, example_metadata, example_arkit), strict=False
+    )
+    traced_model = torch.jit.freeze(traced_model.eval())
     
-    # Convert to Core ML
+    # Convert to Core ML ML Program; FP16 compute runs natively on the Neural Engine
     mlmodel = ct.convert(
         traced_model,
+        convert_to='mlprogram',
+        compute_precision=ct.precision.FLOAT16 if quantize else ct.precision.FLOAT32,
+        minimum_deployment_target=ct.target.iOS16,
         inputs=[
-            ct.TensorType(name="image", shape=example_image.shape),
+            ct.ImageType(
+                name="image",
+                shape=example_image.shape,
+                scale=1.0 / 255.0,
+                bias=[0.0, 0.0, 0.0]
+            ),
             ct.TensorType(name="metadata", shape=example_metadata.shape),
             ct.TensorType(name="arkit_features", shape=example_arkit.shape)
         ],
@@ -615,9 +1264,14 @@ def convert_to_coreml(
         ]
     )
     
-    # Quantize to 16-bit if requested
+    # Quantize weights to int8 if requested (halves size again over FP16)
     if quantize:
-        mlmodel = ct.models.neural_network.quantization_utils.quantize_weights(mlmodel, nbits=16)
+        op_config = ct.optimize.coreml.OpLinearQuantizerConfig(
+            mode='linear_symmetric',
+            weight_threshold=1024
+        )
+        config = ct.optimize.coreml.OptimizationConfig(global_config=op_config)
+        mlmodel = ct.optimize.coreml.linear_quantize_weights(mlmodel, config=config)
     
     # Save model
     mlmodel.save(output_path)
@@ -635,8 +1289,18 @@ def main():
     parser.add_argument('--epochs', type=int, default=50, help='Number of training epochs')
     parser.add_argument('--batch_size', type=int, default=32, help='Batch size')
     parser.add_argument('--learning_rate', type=float, default=0.001, help='Learning rate')
-    parser.add_argument('--quantize', action='store_true', help='Quantize model to 16-bit')
+    parser.add_argument('--quantize', action='store_true', help='Export with FP16 compute and int8 weights')
     parser.add_argument('--device', type=str, default='cpu', choices=['cpu', 'cuda'], help='Device to use')
+    parser.add_argument('--no_compile', action='store_true',
+                        help='Disable torch.compile of the model and loss on CUDA')
+    parser.add_argument('--gradient_checkpointing', action='store_true',
+                        help='Recompute backbone and fusion activations in backward to reduce memory')
+    parser.add_argument('--prepare_cache', action='store_true',
+                        help='Build the memory-mapped image cache before training if it is missing')
+    parser.add_argument('--precompute_features', action='store_true',
+                        help='Run the image backbone once and train only fusion/heads on cached features')
+    parser.add_argument('--distill_heads', action='store_true',
+                        help='Collapse task heads to single Linear layers (fit on validation data) for export')
     
     args = parser.parse_args()
     
@@ -666,6 +1330,11 @@ def main():
         print("\nSee DATA_PREPARATION.md for data format details.")
         return
     
+    if args.prepare_cache:
+        print("Preparing image cache...")
+        count = FacialAnalysisDataset.prepare_cache(args.data_dir)
+        print(f"Cached {count} images" if count else "Using existing image cache")
+    
     # Create full dataset first (this merges all dataframes)
     print("Creating datasets...")
     full_dataset = FacialAnalysisDataset(
@@ -686,31 +1355,31 @@ def main():
     train_dataset = torch.utils.data.Subset(full_dataset, train_indices)
     val_dataset = torch.utils.data.Subset(full_dataset, val_indices)
     
-    # Create data loaders
-    train_loader = DataLoader(
-        train_dataset,
-        batch_size=args.batch_size,
-        shuffle=True,
-        num_workers=2,
-        pin_memory=True if args.device == 'cuda' else False
-    )
+    # Create model
+    print("Creating model...")
+    model = FacialAnalysisModel(use_checkpointing=args.gradient_checkpointing)
+    print(f"Model parameters: {sum(p.numel() for p in model.parameters()):,}")
     
-    val_loader = DataLoader(
-        val_dataset,
-        batch_size=args.batch_size,
-        shuffle=False,
-        num_workers=2,
-        pin_memory=True if args.device == 'cuda' else False
+    # Optionally replace images with cached backbone features (frozen backbone)
+    if args.precompute_features:
+        print("Precomputing image features...")
+        features_path = os.path.join(args.output_dir, 'image_features.npy')
+        features = precompute_image_features(
+            model, full_dataset, features_path,
+            batch_size=args.batch_size, device=args.device
+        )
+        full_dataset.set_image_features(features)
+        model.image_backbone.requires_grad_(False)
+        print(f"Image features cached to {features_path}")
+    
+    # Create data loaders
+    train_loader, val_loader = build_loaders(
+        train_dataset, val_dataset, args.batch_size, device=args.device
     )
     
     print(f"Training samples: {len(train_dataset)}")
     print(f"Validation samples: {len(val_dataset)}")
     
-    # Create model
-    print("Creating model...")
-    model = FacialAnalysisModel()
-    print(f"Model parameters: {sum(p.numel() for p in model.parameters()):,}")
-    
     # Train model
     print(f"\nStarting training on {args.device}...")
     print(f"Epochs: {args.epochs}, Batch size: {args.batch_size}, Learning rate: {args.learning_rate}")
@@ -721,7 +1390,8 @@ def main():
         val_loader,
         num_epochs=args.epochs,
         learning_rate=args.learning_rate,
-        device=args.device
+        device=args.device,
+        compile_model=not args.no_compile
     )
     
     # Save training history
@@ -738,19 +1408,16 @@ def main():
         json.dump(history_dict, f, indent=2)
     print(f"\nTraining history saved to {history_path}")
     
-    # Load best model
-    print("Loading best model...")
-    best_model_path = os.path.join(os.getcwd(), 'best_model.pth')
-    if os.path.exists(best_model_path):
-        model.load_state_dict(torch.load(best_model_path))
-    else:
-        print("Warning: Best model checkpoint not found. Using final model.")
+    # train_model restores the best validation weights into model
     
     # Convert to Core ML
     if COREML_AVAILABLE:
         print("Converting to Core ML format...")
-        model_path = os.path.join(args.output_dir, 'FacialAnalysisModel.mlmodelc')
-        convert_to_coreml(model, model_path, quantize=args.quantize)
+        model_path = os.path.join(args.output_dir, 'FacialAnalysisModel.mlpackage')
+        convert_to_coreml(
+            model, model_path, quantize=args.quantize,
+            distill_loader=val_loader if args.distill_heads else None
+        )
         print(f"Core ML model saved to {model_path}")
         print("Add this file to your Xcode project bundle.")
     else:
@@ -764,7 +1431,7 @@ def main():
         'metadata_features': 6,
         'arkit_features': 10,
         'outputs': ['angle', 'category', 'confidence'],
-        'quantization': '16-bit' if args.quantize else '32-bit',
+        'quantization': 'float16 compute, int8 weights' if args.quantize else 'float32',
         'parameters': sum(p.numel() for p in model.parameters())
     }
     